@@ -1,16 +1,30 @@
 """
 API Flask para Sistema de Presença
 """
-from flask import Flask, request
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
-from models import GerenciadorDados
-from utils import json_response, handle_errors, validate_required_fields
+from models import GerenciadorDados, TAMANHO_LOTE_PADRAO, TAMANHO_LOTE_MAXIMO
+from utils import (json_response, handle_errors, validate_required_fields,
+                   profile_request, has_profile_token, listar_profiles)
 from datetime import datetime
+import os
 
 # Inicialização
 app = Flask(__name__)
 CORS(app)  # Permite requisições do frontend
 
+# Profiling sob demanda (desativado por padrão)
+app.config.update(
+    PROFILING_ENABLED=os.getenv('PROFILING_ENABLED', '0').lower() in ('1', 'true', 'sim'),
+    PROFILING_TOKEN=os.getenv('PROFILING_TOKEN', ''),
+    PROFILING_SAMPLE_RATE=float(os.getenv('PROFILING_SAMPLE_RATE', '0')),
+    PROFILING_DIR=os.path.abspath(os.getenv('PROFILING_DIR', 'data/profiles')),
+    PROFILING_MAX_FILES=int(os.getenv('PROFILING_MAX_FILES', '50'))
+)
+
+if app.config['PROFILING_MAX_FILES'] < 1:
+    raise ValueError('PROFILING_MAX_FILES deve ser maior ou igual a 1')
+
 # Gerenciador de dados
 db = GerenciadorDados()
 
@@ -27,6 +41,7 @@ def health_check():
 
 
 @app.route('/api/turmas', methods=['GET'])
+@profile_request
 @handle_errors
 def listar_turmas():
     """
@@ -41,6 +56,7 @@ def listar_turmas():
 
 
 @app.route('/api/turmas/<int:turma_id>/alunos', methods=['GET'])
+@profile_request
 @handle_errors
 def listar_alunos_turma(turma_id: int):
     """
@@ -66,6 +82,7 @@ def listar_alunos_turma(turma_id: int):
 
 
 @app.route('/api/presencas', methods=['POST'])
+@profile_request
 @handle_errors
 def salvar_presencas():
     """
@@ -113,6 +130,7 @@ def salvar_presencas():
 
 
 @app.route('/api/presencas', methods=['GET'])
+@profile_request
 @handle_errors
 def listar_presencas():
     """
@@ -131,6 +149,7 @@ def listar_presencas():
 
 
 @app.route('/api/turmas/<int:turma_id>/estatisticas', methods=['GET'])
+@profile_request
 @handle_errors
 def obter_estatisticas(turma_id: int):
     """
@@ -146,6 +165,7 @@ def obter_estatisticas(turma_id: int):
 
 
 @app.route('/api/alunos/buscar', methods=['GET'])
+@profile_request
 @handle_errors
 def buscar_aluno():
     """
@@ -169,6 +189,99 @@ def buscar_aluno():
     )
 
 
+@app.route('/api/alunos/importar', methods=['POST'])
+@profile_request
+@handle_errors
+def importar_alunos():
+    """
+    POST /api/alunos/importar?parcial=false&tamanho_lote=50000 (máximo 100000)
+    Importa alunos de um CSV (upsert por cod_aluno)
+
+    Aceita upload multipart no campo "arquivo" ou o CSV direto no corpo.
+    Com parcial=false (padrão) qualquer linha inválida cancela a importação.
+    """
+    parcial = request.args.get('parcial', 'false').lower() in ('1', 'true', 'sim')
+    # Limitado no servidor: um lote gigante anularia a leitura em lotes
+    tamanho_lote = min(request.args.get('tamanho_lote', TAMANHO_LOTE_PADRAO, type=int),
+                       TAMANHO_LOTE_MAXIMO)
+
+    if 'arquivo' in request.files:
+        arquivo = request.files['arquivo'].stream
+    else:
+        arquivo = request.stream
+
+    relatorio = db.importar_alunos(arquivo, tamanho_lote=tamanho_lote, parcial=parcial)
+
+    if not relatorio['aplicado']:
+        return json_response(
+            success=False,
+            data=relatorio,
+            message=f"Importação cancelada: {relatorio['rejeitados']} linha(s) com erro",
+            status_code=400
+        )
+
+    return json_response(
+        data=relatorio,
+        message=(f"{relatorio['inseridos']} aluno(s) inserido(s), "
+                 f"{relatorio['atualizados']} atualizado(s)")
+    )
+
+
+# ==================== ADMIN ====================
+
+def _verificar_acesso_admin():
+    """Rotas de admin exigem profiling ativo e o token no header"""
+    if not app.config['PROFILING_ENABLED'] or not has_profile_token():
+        return json_response(
+            success=False,
+            message='Acesso negado',
+            status_code=403
+        )
+    return None
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@handle_errors
+def listar_profiles_admin():
+    """
+    GET /api/admin/profiles
+    Lista os profiles de requisições salvos (header X-Profile-Token)
+    """
+    negado = _verificar_acesso_admin()
+    if negado:
+        return negado
+
+    profiles = listar_profiles(app.config['PROFILING_DIR'])
+    return json_response(
+        data=profiles,
+        message=f'{len(profiles)} profile(s) encontrado(s)'
+    )
+
+
+@app.route('/api/admin/profiles/<nome>', methods=['GET'])
+@handle_errors
+def baixar_profile(nome: str):
+    """
+    GET /api/admin/profiles/{nome}
+    Baixa um profile (.prof, abrir com pstats ou snakeviz)
+    """
+    negado = _verificar_acesso_admin()
+    if negado:
+        return negado
+
+    if not nome.endswith('.prof') or os.path.basename(nome) != nome:
+        raise ValueError('Nome de profile inválido')
+
+    if not os.path.isfile(os.path.join(app.config['PROFILING_DIR'], nome)):
+        return json_response(
+            success=False,
+            message=f'Profile {nome} não encontrado',
+            status_code=404
+        )
+
+    return send_from_directory(app.config['PROFILING_DIR'], nome, as_attachment=True)
+
+
 # ==================== ERRO HANDLERS ====================
 
 @app.errorhandler(404)
@@ -207,6 +320,9 @@ if __name__ == '__main__':
     print("   GET  /api/presencas")
     print("   GET  /api/turmas/{id}/estatisticas")
     print("   GET  /api/alunos/buscar?q=nome")
+    print("   POST /api/alunos/importar")
+    print("   GET  /api/admin/profiles")
+    print("   GET  /api/admin/profiles/{nome}")
     print("=" * 50)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
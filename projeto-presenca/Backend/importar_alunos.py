@@ -0,0 +1,45 @@
+"""
+Importação de alunos via linha de comando
+
+Uso:
+    python Backend/importar_alunos.py novos_alunos.csv [--parcial] [--tamanho-lote N]
+"""
+import argparse
+import sys
+from models import GerenciadorDados, TAMANHO_LOTE_PADRAO
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Importa alunos de um CSV (upsert por cod_aluno)')
+    parser.add_argument('arquivo', help='CSV com cod_aluno, cod_turma, nome_aluno[, presenca_aluno]')
+    parser.add_argument('--csv', default='data/alunos.csv', help='Cadastro de alunos a atualizar')
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help='Quantidade de linhas lidas por lote')
+    parser.add_argument('--parcial', action='store_true',
+                        help='Aplica as linhas válidas mesmo havendo erros')
+    args = parser.parse_args()
+
+    db = GerenciadorDados(csv_path=args.csv)
+
+    try:
+        relatorio = db.importar_alunos(args.arquivo, tamanho_lote=args.tamanho_lote,
+                                       parcial=args.parcial)
+    except ValueError as e:
+        print(f"❌ Erro de validação: {e}")
+        return 1
+
+    print(f"📄 Linhas lidas: {relatorio['linhas_lidas']}")
+    print(f"➕ Inseridos: {relatorio['inseridos']}")
+    print(f"🔁 Atualizados: {relatorio['atualizados']}")
+    print(f"⛔ Rejeitados: {relatorio['rejeitados']}")
+    print(f"♻️ Repetidos no arquivo: {relatorio['repetidos']}")
+    for erro in relatorio['erros']:
+        print(f"   linha {erro['linha']} ({erro['cod_aluno']}): {erro['erro']}")
+    if relatorio['rejeitados'] > len(relatorio['erros']):
+        print(f"   ... e mais {relatorio['rejeitados'] - len(relatorio['erros'])} erro(s)")
+
+    return 0 if relatorio['aplicado'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
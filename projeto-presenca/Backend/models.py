@@ -2,12 +2,29 @@
 Modelos de dados e lógica de negócio
 """
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, IO, Union
 from datetime import datetime
 import pandas as pd
+from contextlib import contextmanager
+import sqlite3
+import tempfile
+import shutil
 import json
 import os
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+COLUNAS_ALUNOS = ['cod_aluno', 'cod_turma', 'nome_aluno', 'presenca_aluno']
+STATUS_PRESENCA = ('presente', 'ausente')
+TAMANHO_LOTE_PADRAO = 50000
+TAMANHO_LOTE_MAXIMO = 100000
+MAX_ERROS_REPORTADOS = 100
+
 
 @dataclass
 class Aluno:
@@ -88,10 +105,10 @@ class GerenciadorDados:
                 'presenca_aluno': str  # ← NOVO
             })
             
-            # Garantir que a coluna presenca_aluno existe
+            # Garantir que a coluna presenca_aluno existe (apenas em memória;
+            # o arquivo é regravado na próxima escrita de presenças)
             if 'presenca_aluno' not in df.columns:
                 df['presenca_aluno'] = 'presente'
-                df.to_csv(self.csv_path, index=False)
             
             self._alunos_cache = [
                 Aluno(
@@ -222,6 +239,27 @@ class GerenciadorDados:
             return False
 
     
+    @contextmanager
+    def _travar_csv(self):
+        """
+        Trava exclusiva sobre o CSV de alunos, válida entre processos
+        (workers do gunicorn), usando um arquivo .lock ao lado do CSV
+        """
+        with open(f"{self.csv_path}.lock", 'a+') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
     def atualizar_presencas_lote_csv(self, presencas: List[Dict]) -> bool:
         """
         Atualiza múltiplas presenças de uma vez no CSV
@@ -233,20 +271,21 @@ class GerenciadorDados:
             bool: True se sucesso, False se erro
         """
         try:
-            df = pd.read_csv(self.csv_path, dtype={'cod_aluno': str})
-            
-            # Garantir que presenca_aluno existe
-            if 'presenca_aluno' not in df.columns:
-                df['presenca_aluno'] = 'presente'
-            
-            # Atualizar cada aluno
-            for presenca in presencas:
-                aluno_id = presenca['aluno_id']
-                status = 'presente' if presenca['presente'] else 'ausente'
-                df.loc[df['cod_aluno'] == aluno_id, 'presenca_aluno'] = status
-            
-            # Salvar CSV
-            df.to_csv(self.csv_path, index=False)
+            with self._travar_csv():
+                df = pd.read_csv(self.csv_path, dtype={'cod_aluno': str})
+                
+                # Garantir que presenca_aluno existe
+                if 'presenca_aluno' not in df.columns:
+                    df['presenca_aluno'] = 'presente'
+                
+                # Atualizar cada aluno
+                for presenca in presencas:
+                    aluno_id = presenca['aluno_id']
+                    status = 'presente' if presenca['presente'] else 'ausente'
+                    df.loc[df['cod_aluno'] == aluno_id, 'presenca_aluno'] = status
+                
+                # Salvar CSV
+                df.to_csv(self.csv_path, index=False)
             
             # Limpar cache
             self._alunos_cache = None
@@ -256,7 +295,287 @@ class GerenciadorDados:
         except Exception as e:
             print(f"❌ Erro ao atualizar presenças no CSV: {e}")
             return False
-    
+
+    def importar_alunos(self, arquivo: Union[str, IO],
+                        tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+                        parcial: bool = False) -> Dict:
+        """
+        Importa alunos de um CSV em lotes, mesclando com o cadastro atual (upsert)
+
+        Cada lote é validado (tipos e cod_aluno repetido no arquivo) e
+        gravado numa base SQLite temporária, então nunca há mais de um lote
+        em memória. Só a primeira ocorrência de um cod_aluno é aplicada; as
+        demais são rejeitadas, em qualquer lote. O cadastro só é travado no
+        fim, para mesclar e trocar o CSV atomicamente com os.replace.
+
+        Args:
+            arquivo: Caminho ou objeto de arquivo com o CSV
+            tamanho_lote: Quantidade de linhas por lote
+            parcial: Se True, aplica as linhas válidas mesmo havendo erros;
+                     se False, qualquer erro cancela a importação
+
+        Returns:
+            Dict: Relatório com contagens e erros por linha
+        """
+        if tamanho_lote <= 0:
+            raise ValueError('tamanho_lote deve ser maior que zero')
+
+        relatorio = {
+            'linhas_lidas': 0,
+            'inseridos': 0,
+            'atualizados': 0,
+            'rejeitados': 0,
+            'repetidos': 0,
+            'erros': [],
+            'aplicado': False
+        }
+
+        diretorio = os.path.dirname(os.path.abspath(self.csv_path))
+        fd, db_path = tempfile.mkstemp(suffix='.db', dir=diretorio)
+        os.close(fd)
+        conn = sqlite3.connect(db_path)
+
+        try:
+            conn.execute('PRAGMA journal_mode = OFF')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(
+                'CREATE TABLE alunos (cod_aluno TEXT PRIMARY KEY, cod_turma INTEGER, '
+                'nome_aluno TEXT, presenca_aluno TEXT)'
+            )
+            # Linhas válidas do arquivo (com a linha de origem), usadas também
+            # para detectar cod_aluno repetido entre lotes diferentes
+            conn.execute(
+                'CREATE TABLE importados (cod_aluno TEXT PRIMARY KEY, linha INTEGER, '
+                'cod_turma INTEGER, nome_aluno TEXT, presenca_aluno TEXT)'
+            )
+            conn.execute('CREATE TABLE lote_chaves (cod_aluno TEXT, linha INTEGER)')
+            conn.execute('CREATE INDEX idx_lote_chaves ON lote_chaves (cod_aluno)')
+
+            # ========== PARTE 1: VALIDAR E PREPARAR IMPORTAÇÃO ==========
+            # Sem trava: um upload lento não pode bloquear o registro de presenças
+            try:
+                leitor = pd.read_csv(arquivo, dtype=str, keep_default_na=False,
+                                     chunksize=tamanho_lote)
+                primeira_linha = 2  # linha 1 é o cabeçalho
+                for lote in leitor:
+                    validos, erros = self._validar_lote(lote, primeira_linha)
+                    validos, repetidos = self._separar_repetidos(conn, validos)
+                    erros = sorted(erros + repetidos, key=lambda e: e['linha'])
+                    primeira_linha += len(lote)
+                    relatorio['linhas_lidas'] += len(lote)
+                    relatorio['repetidos'] += len(repetidos)
+                    relatorio['rejeitados'] += len(erros)
+
+                    espaco = MAX_ERROS_REPORTADOS - len(relatorio['erros'])
+                    relatorio['erros'].extend(erros[:max(espaco, 0)])
+
+                    self._preparar_lote(conn, validos)
+            except pd.errors.EmptyDataError:
+                raise ValueError('Arquivo CSV vazio')
+            except pd.errors.ParserError as e:
+                raise ValueError(f'CSV malformado: {e}')
+
+            if relatorio['rejeitados'] and not parcial:
+                print(f"⚠️ Importação cancelada: {relatorio['rejeitados']} linha(s) com erro")
+                return relatorio
+
+            # Trava só a mesclagem: uma gravação de presenças feita entre a
+            # leitura do cadastro e o os.replace seria descartada
+            with self._travar_csv():
+                # ========== PARTE 2: CARREGAR CADASTRO ATUAL ==========
+                if os.path.exists(self.csv_path) and os.path.getsize(self.csv_path) > 0:
+                    for lote in pd.read_csv(self.csv_path, dtype=str, keep_default_na=False,
+                                            chunksize=tamanho_lote):
+                        if 'presenca_aluno' not in lote.columns:
+                            lote['presenca_aluno'] = ''
+                        self._upsert_lote(conn, lote)
+
+                # ========== PARTE 3: MESCLAR IMPORTAÇÃO ==========
+                total = conn.execute('SELECT COUNT(*) FROM importados').fetchone()[0]
+                inseridos = conn.execute(
+                    'SELECT COUNT(*) FROM importados i '
+                    'WHERE NOT EXISTS (SELECT 1 FROM alunos a WHERE a.cod_aluno = i.cod_aluno)'
+                ).fetchone()[0]
+                # presenca_aluno vazio mantém o status atual (ou 'presente' se novo)
+                conn.execute(
+                    'INSERT INTO alunos (cod_aluno, cod_turma, nome_aluno, presenca_aluno) '
+                    'SELECT cod_aluno, cod_turma, nome_aluno, presenca_aluno '
+                    'FROM importados WHERE true ORDER BY linha '
+                    'ON CONFLICT(cod_aluno) DO UPDATE SET '
+                    'cod_turma = excluded.cod_turma, '
+                    'nome_aluno = excluded.nome_aluno, '
+                    'presenca_aluno = COALESCE(excluded.presenca_aluno, alunos.presenca_aluno)'
+                )
+
+                # ========== PARTE 4: GRAVAR E TROCAR ATOMICAMENTE ==========
+                fd, csv_tmp = tempfile.mkstemp(suffix='.csv', dir=diretorio)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                        f.write(','.join(COLUNAS_ALUNOS) + '\n')
+                        cursor = conn.execute(
+                            "SELECT cod_aluno, cod_turma, nome_aluno, "
+                            "COALESCE(presenca_aluno, 'presente') FROM alunos ORDER BY rowid"
+                        )
+                        while True:
+                            linhas = cursor.fetchmany(tamanho_lote)
+                            if not linhas:
+                                break
+                            pd.DataFrame(linhas, columns=COLUNAS_ALUNOS).to_csv(
+                                f, index=False, header=False, lineterminator='\n'
+                            )
+                    # mkstemp cria o arquivo com 0600; manter as permissões do original
+                    if os.path.exists(self.csv_path):
+                        shutil.copymode(self.csv_path, csv_tmp)
+                    os.replace(csv_tmp, self.csv_path)
+                except Exception:
+                    if os.path.exists(csv_tmp):
+                        os.remove(csv_tmp)
+                    raise
+
+            # Limpar cache
+            self._alunos_cache = None
+            relatorio['inseridos'] = inseridos
+            relatorio['atualizados'] = total - inseridos
+            relatorio['aplicado'] = True
+
+            print(f"✅ Importação concluída: {relatorio['inseridos']} inserido(s), "
+                  f"{relatorio['atualizados']} atualizado(s), "
+                  f"{relatorio['rejeitados']} rejeitado(s)")
+            return relatorio
+        finally:
+            conn.close()
+            os.remove(db_path)
+
+    @staticmethod
+    def _validar_lote(lote: pd.DataFrame, primeira_linha: int):
+        """
+        Valida um lote da importação
+
+        Args:
+            lote: DataFrame com as colunas lidas como texto
+            primeira_linha: Número da linha do arquivo correspondente ao 1º registro
+
+        Returns:
+            tuple: (DataFrame com linhas válidas, lista de erros por linha)
+        """
+        faltando = [c for c in COLUNAS_ALUNOS[:3] if c not in lote.columns]
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias faltando: {', '.join(faltando)}")
+
+        lote = lote.reset_index(drop=True)
+        cod_aluno = lote['cod_aluno'].str.strip()
+        nome_aluno = lote['nome_aluno'].str.strip()
+        cod_turma = pd.to_numeric(lote['cod_turma'].str.strip(), errors='coerce')
+        if 'presenca_aluno' in lote.columns:
+            presenca = lote['presenca_aluno'].str.strip().str.lower()
+        else:
+            presenca = pd.Series('', index=lote.index)
+
+        verificacoes = [
+            (cod_aluno == '', 'cod_aluno vazio'),
+            (cod_turma.isna() | (cod_turma % 1 != 0), 'cod_turma deve ser inteiro'),
+            # Limite do INTEGER do SQLite (int64)
+            ((cod_turma < 0) | (cod_turma >= 2 ** 63), 'cod_turma fora do intervalo permitido'),
+            (nome_aluno == '', 'nome_aluno vazio'),
+            (~presenca.isin(STATUS_PRESENCA + ('',)),
+             "presenca_aluno deve ser 'presente' ou 'ausente'"),
+        ]
+
+        invalido = pd.Series(False, index=lote.index)
+        for mascara, _ in verificacoes:
+            invalido |= mascara
+
+        erros = [
+            {
+                'linha': primeira_linha + i,
+                'cod_aluno': cod_aluno[i],
+                'erro': '; '.join(msg for mascara, msg in verificacoes if mascara[i])
+            }
+            for i in lote.index[invalido]
+        ]
+
+        validos = pd.DataFrame({
+            'linha': primeira_linha + lote.index,
+            'cod_aluno': cod_aluno,
+            'cod_turma': cod_turma,
+            'nome_aluno': nome_aluno,
+            'presenca_aluno': presenca
+        })[~invalido]
+
+        return validos, erros
+
+    @staticmethod
+    def _separar_repetidos(conn: sqlite3.Connection, validos: pd.DataFrame):
+        """
+        Rejeita linhas cujo cod_aluno já apareceu antes no arquivo
+
+        Compara com o próprio lote e com os lotes anteriores (tabela
+        importados), então o resultado não depende do tamanho do lote.
+        Os erros nunca incluem a primeira ocorrência, só as seguintes.
+
+        Returns:
+            tuple: (DataFrame sem repetidos, lista de erros por linha)
+        """
+        conn.execute('DELETE FROM lote_chaves')
+        conn.executemany(
+            'INSERT INTO lote_chaves (cod_aluno, linha) VALUES (?, ?)',
+            zip(validos['cod_aluno'], validos['linha'].map(int))
+        )
+        repetidos = conn.execute(
+            'SELECT l.linha, l.cod_aluno, '
+            'COALESCE(i.linha, (SELECT MIN(o.linha) FROM lote_chaves o '
+            '                   WHERE o.cod_aluno = l.cod_aluno)) '
+            'FROM lote_chaves l LEFT JOIN importados i ON i.cod_aluno = l.cod_aluno '
+            'WHERE i.cod_aluno IS NOT NULL OR EXISTS ('
+            '    SELECT 1 FROM lote_chaves o '
+            '    WHERE o.cod_aluno = l.cod_aluno AND o.linha < l.linha)'
+        ).fetchall()
+        erros = [
+            {
+                'linha': linha,
+                'cod_aluno': cod,
+                'erro': f'cod_aluno repetido no arquivo (primeira ocorrência na linha {original})'
+            }
+            for linha, cod, original in repetidos
+        ]
+        linhas_repetidas = {e['linha'] for e in erros}
+
+        return validos[~validos['linha'].isin(linhas_repetidas)], erros
+
+    @staticmethod
+    def _preparar_lote(conn: sqlite3.Connection, validos: pd.DataFrame):
+        """Grava as linhas válidas (sem repetidos) de um lote na tabela importados"""
+        conn.executemany(
+            'INSERT INTO importados (cod_aluno, linha, cod_turma, nome_aluno, presenca_aluno) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (
+                (str(cod), int(linha), int(turma), str(nome), presenca or None)
+                for linha, cod, turma, nome, presenca
+                in validos[['linha'] + COLUNAS_ALUNOS].itertuples(index=False, name=None)
+            )
+        )
+
+    @staticmethod
+    def _upsert_lote(conn: sqlite3.Connection, lote: pd.DataFrame):
+        """
+        Insere ou atualiza um lote do cadastro atual na base temporária
+
+        presenca_aluno vazio é gravado como NULL (exportado como 'presente').
+        """
+        conn.executemany(
+            'INSERT INTO alunos (cod_aluno, cod_turma, nome_aluno, presenca_aluno) '
+            'VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(cod_aluno) DO UPDATE SET '
+            'cod_turma = excluded.cod_turma, '
+            'nome_aluno = excluded.nome_aluno, '
+            'presenca_aluno = COALESCE(excluded.presenca_aluno, alunos.presenca_aluno)',
+            (
+                (str(cod), int(float(turma)), str(nome), presenca or None)
+                for cod, turma, nome, presenca
+                in lote[COLUNAS_ALUNOS].itertuples(index=False, name=None)
+            )
+        )
+
     def obter_turmas(self) -> List[Turma]:
         """Retorna lista de turmas únicas do CSV"""
         alunos = self.carregar_alunos()
@@ -2,8 +2,21 @@
 Funções utilitárias
 """
 from functools import wraps
-from flask import jsonify, request
-from typing import Callable, Any
+from flask import jsonify, request, current_app
+from typing import Callable, Any, List, Dict
+from datetime import datetime
+import threading
+import cProfile
+import random
+import hmac
+import time
+import os
+
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+# cProfile só permite um profiler ativo por vez no processo
+_profile_lock = threading.Lock()
 
 
 def json_response(success: bool = True, data: Any = None, 
@@ -42,6 +55,96 @@ def handle_errors(f: Callable) -> Callable:
     return decorated_function
 
 
+def profile_request(f: Callable) -> Callable:
+    """
+    Decorator que captura um cProfile da requisição
+
+    Ativo apenas com PROFILING_ENABLED; a requisição é perfilada se trouxer
+    o header X-Profile-Token igual a PROFILING_TOKEN ou se for sorteada
+    por PROFILING_SAMPLE_RATE. Desativado, custa uma consulta ao config.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        config = current_app.config
+        if not config.get('PROFILING_ENABLED'):
+            return f(*args, **kwargs)
+
+        if not (has_profile_token() or
+                random.random() < config.get('PROFILING_SAMPLE_RATE', 0.0)):
+            return f(*args, **kwargs)
+
+        # Outra requisição já está sendo perfilada
+        if not _profile_lock.acquire(blocking=False):
+            return f(*args, **kwargs)
+
+        try:
+            profiler = cProfile.Profile()
+            inicio = time.perf_counter()
+            profiler.enable()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                profiler.disable()
+                duracao_ms = (time.perf_counter() - inicio) * 1000
+                try:
+                    _salvar_profile(profiler, f.__name__, duracao_ms)
+                except Exception as e:
+                    print(f"⚠️ Erro ao salvar profile: {e}")
+        finally:
+            _profile_lock.release()
+    return decorated_function
+
+
+def has_profile_token() -> bool:
+    """Verifica se a requisição traz o token privilegiado de profiling"""
+    token = current_app.config.get('PROFILING_TOKEN')
+    recebido = request.headers.get(PROFILE_HEADER)
+    if not token or not recebido:
+        return False
+    # Compara bytes: em str, compare_digest rejeita caracteres não-ASCII
+    return hmac.compare_digest(recebido.encode('utf-8'), token.encode('utf-8'))
+
+
+def _salvar_profile(profiler: cProfile.Profile, endpoint: str, duracao_ms: float) -> None:
+    """Grava o profile e descarta os mais antigos (buffer circular em disco)"""
+    diretorio = current_app.config['PROFILING_DIR']
+    os.makedirs(diretorio, exist_ok=True)
+
+    nome = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{endpoint}_{duracao_ms:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(diretorio, nome))
+
+    excedentes = listar_profiles(diretorio)[current_app.config['PROFILING_MAX_FILES']:]
+    for profile in excedentes:
+        try:
+            os.remove(os.path.join(diretorio, profile['nome']))
+        except OSError:
+            pass
+
+
+def listar_profiles(diretorio: str) -> List[Dict]:
+    """Lista profiles salvos, do mais recente para o mais antigo"""
+    if not os.path.isdir(diretorio):
+        return []
+
+    profiles = []
+    for nome in os.listdir(diretorio):
+        if not nome.endswith('.prof'):
+            continue
+        # Outro worker pode ter removido o arquivo ao descartar antigos
+        try:
+            info = os.stat(os.path.join(diretorio, nome))
+        except OSError:
+            continue
+        profiles.append({
+            'nome': nome,
+            'tamanho_bytes': info.st_size,
+            'criado_em': datetime.fromtimestamp(info.st_mtime).isoformat()
+        })
+
+    # O nome começa com o timestamp, então ordenar pelo nome ordena por data
+    return sorted(profiles, key=lambda p: p['nome'], reverse=True)
+
+
 def validate_required_fields(data: dict, fields: list) -> None:
     """Valida se campos obrigatórios estão presentes"""
     missing = [field for field in fields if field not in data]